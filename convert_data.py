@@ -1,17 +1,36 @@
-import pickle                                                                                                                       
-import json                                                                                                                         
-import numpy as np                                                                                                                  
-# Load the pickle files                                                                                                             
-with open('find_my_uri/data/document_metadata.pickle', 'rb') as f:                                                                         
-    metadata = pickle.load(f)
+import json
+from pathlib import Path
+import numpy as np
+from find_my_uri.core import load_embeddings
+try:
+    # orjson is much faster than the stdlib encoder; it is optional for this script
+    import orjson
+except ImportError:
+    orjson = None
+with open('find_my_uri/data/document_metadata.json', 'rb') as f:
+    metadata = json.load(f)
 
-with open('find_my_uri/data/embeddings.pickle', 'rb') as f:                                                                                
-    embeddings = pickle.load(f)                                                                                                    
+embeddings = load_embeddings(Path('find_my_uri/data/embeddings.npy'))
 
-embeddings_list = embeddings.tolist()                                                                                                              
-with open('docs/data/metadata.json', 'w') as f:                                                                                     
-    json.dump(metadata, f)                                                                                                          
+if orjson is not None:
+    with open('docs/data/metadata.json', 'wb') as f:
+        f.write(orjson.dumps(metadata))
+else:
+    with open('docs/data/metadata.json', 'w') as f:
+        json.dump(metadata, f)
 
-with open('docs/data/embeddings.json', 'w') as f:                                                                                   
-    json.dump(embeddings_list, f)                                                                                                   
-print("Data converted to JSON successfully.")   
\ No newline at end of file
+# Embeddings are quantized to int8 so the browser downloads a quarter of the bytes.
+# Each unit-length row gets its own max-abs scale; the frontend ranks by cosine
+# similarity, which that scale does not change, so only the int8 values are shipped.
+# Rows are streamed from the memory map in chunks rather than converted in one go.
+CHUNK_ROWS = 4096
+with open('docs/data/embeddings.bin', 'wb') as f:
+    for start in range(0, len(embeddings), CHUNK_ROWS):
+        chunk = np.asarray(embeddings[start:start + CHUNK_ROWS], dtype=np.float32)
+        scale = np.abs(chunk).max(axis=1, keepdims=True) / 127
+        scale[scale == 0] = 1
+        f.write(np.round(chunk / scale).astype(np.int8).tobytes())
+
+with open('docs/data/embeddings.meta.json', 'w') as f:
+    json.dump({"dtype": "int8", "shape": list(embeddings.shape)}, f)
+print("Data converted successfully.")
@@ -10,12 +10,28 @@ document.addEventListener('DOMContentLoaded', async () => {
 
     statusDiv.textContent = 'Loading data files...';
 
-    // Load the JSON data files
+    // Load the metadata and the raw (int8-quantized) embedding matrix
     const metadataResponse = await fetch('data/metadata.json');
     const metadata = await metadataResponse.json();
 
-    const embeddingsResponse = await fetch('data/embeddings.json');
-    const embeddings = await embeddingsResponse.json();
+    const embeddingsMetaResponse = await fetch('data/embeddings.meta.json');
+    const embeddingsMeta = await embeddingsMetaResponse.json();
+    const [nRows, dim] = embeddingsMeta.shape;
+    const ArrayType = { float32: Float32Array, int8: Int8Array }[embeddingsMeta.dtype];
+
+    const embeddingsResponse = await fetch('data/embeddings.bin');
+    const embeddingData = new ArrayType(await embeddingsResponse.arrayBuffer());
+    const embeddings = Array.from({ length: nRows }, (_, i) => embeddingData.subarray(i * dim, (i + 1) * dim));
+
+    // Rows are quantized with a per-row scale, so they are not unit length; their
+    // norms are fixed, so invert them once here instead of on every search
+    const inverseNorms = Float32Array.from(embeddings, row => {
+        let norm = 0.0;
+        for (let i = 0; i < row.length; i++) {
+            norm += row[i] * row[i];
+        }
+        return 1 / Math.sqrt(norm);
+    });
 
     statusDiv.textContent = 'Loading sentence transformer model...';
 
@@ -24,16 +40,34 @@ document.addEventListener('DOMContentLoaded', async () => {
 
     statusDiv.textContent = 'Ready to search.';
 
-    function cosineSimilarity(vecA, vecB) {
-        let dotProduct = 0.0;
-        let normA = 0.0;
-        let normB = 0.0;
+    function dotProduct(vecA, vecB) {
+        let dot = 0.0;
         for (let i = 0; i < vecA.length; i++) {
-            dotProduct += vecA[i] * vecB[i];
-            normA += vecA[i] * vecA[i];
-            normB += vecB[i] * vecB[i];
+            dot += vecA[i] * vecB[i];
+        }
+        return dot;
+    }
+
+    // Best k scores, highest first, kept in a small sorted buffer so the scan is
+    // O(N * k) with k tiny instead of sorting all N scores
+    function topK(scores, k) {
+        const top = [];
+        if (!(k > 0)) {
+            return top;
+        }
+        for (let index = 0; index < scores.length; index++) {
+            const similarity = scores[index];
+            if (top.length === k && similarity <= top[k - 1].similarity) {
+                continue;
+            }
+            let pos = top.length < k ? top.length : k - 1;
+            while (pos > 0 && top[pos - 1].similarity < similarity) {
+                top[pos] = top[pos - 1];
+                pos--;
+            }
+            top[pos] = { similarity, index };
         }
-        return dotProduct / (Math.sqrt(normA) * Math.sqrt(normB));
+        return top;
     }
 
     searchButton.addEventListener('click', async () => {
@@ -59,11 +93,13 @@ document.addEventListener('DOMContentLoaded', async () => {
 
         // Generate the query embedding
         const output = await extractor(query, { pooling: 'mean', normalize: true });
-        const queryEmbedding = Array.from(output.data);
+        // Already unit length (normalize: true), so only the stored rows need their norms applied
+        const queryEmbedding = output.data;
 
         statusDiv.textContent = 'Searching for similar URIs...';
 
         let filteredEmbeddings = embeddings;
+        let filteredInverseNorms = inverseNorms;
         let filteredMetadata = metadata;
 
         if (namespace) {
@@ -76,16 +112,16 @@ document.addEventListener('DOMContentLoaded', async () => {
 
             const indices = metadata.map((m, i) => m.namespace === namespaceURI ? i : -1).filter(i => i !== -1);
             filteredEmbeddings = indices.map(i => embeddings[i]);
+            filteredInverseNorms = indices.map(i => inverseNorms[i]);
             filteredMetadata = indices.map(i => metadata[i]);
         }
 
-        const similarities = filteredEmbeddings.map(embedding => cosineSimilarity(queryEmbedding, embedding));
+        // Cosine similarity: dot product with the unit query, scaled by the row's inverse norm
+        const similarities = filteredEmbeddings.map((embedding, i) => dotProduct(queryEmbedding, embedding) * filteredInverseNorms[i]);
 
         const nResults = parseInt(nResultsInput.value, 10);
 
-        const topk = similarities.map((similarity, index) => ({ similarity, index }))
-                               .sort((a, b) => b.similarity - a.similarity)
-                               .slice(0, nResults);
+        const topk = topK(similarities, nResults);
 
         statusDiv.textContent = 'Search complete.';
 
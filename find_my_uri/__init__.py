@@ -5,10 +5,16 @@ This package provides tools for loading ontology classes from TTL files and sear
 for URIs using semantic similarity matching with vector databases.
 """
 
-from .core import URIEncoder, URIFinder
-
 __version__ = "0.1.0"
 __author__ = "lazlop"
 __email__ = "lpaul@lbl.gov"
 
-__all__ = ["URIEncoder", "URIFinder"]
+__all__ = ["URIEncoder", "URIFinder", "URIResult"]
+
+
+def __getattr__(name):
+    # Import .core on first use so the CLI can start without loading the embedding stack
+    if name in __all__:
+        from . import core
+        return getattr(core, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
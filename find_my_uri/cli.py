@@ -1,24 +1,69 @@
-from .core import URIFinder, URIFinderConfig, DATA_FILES, DEFAULT_EMBEDDING_MODEL
 import importlib.resources
 import argparse
 import shlex
 from pathlib import Path
-from typing import List, Optional
-
-from .core import URIFinder, URIFinderConfig
-import importlib.resources
-import argparse
-import shlex
-from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, TextIO
 import sys
 import readline
 
+__all__ = ["main"]
+
+# Output templates for _display_results
+_RESULT_TMPL = "{index:2d}. {local_name}\n    Namespace: {namespace}\n"
+_LABEL_TMPL = "    Label: {}\n"
+_COMMENT_TMPL = "    Comment: {}\n"
+_PARENTS_TMPL = "    Parents: {}\n"
+_SIMILARITY_TMPL = "    Similarity: {:.3f}\n"
+
+# Tab completions for commands and options
+COMPLETION_COMMANDS = [
+    'help', 'quit', 'exit', 'history', 
+    '-n', '--num-results', '-ns', '--namespace', '-h', '--help'
+]
+COMPLETION_NAMESPACES = ['S223', 'WATR', 'UNIT', 'QK', 'RDF', 'RDFS', 'OWL']
+
+
+class TrieNode:
+    """Prefix trie node that lists every word passing through it."""
+    
+    __slots__ = ('children', 'terminals')
+    
+    def __init__(self):
+        self.children = {}
+        self.terminals = []
+    
+    def insert(self, word: str):
+        """Insert a word, recording it at every node along its path."""
+        node = self
+        node.terminals.append(word)
+        for char in word:
+            node = node.children.setdefault(char, TrieNode())
+            node.terminals.append(word)
+    
+    def find(self, prefix: str) -> List[str]:
+        """Get all inserted words starting with prefix, in insertion order."""
+        node = self
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.terminals
+
+
 class CommandHistory:
     """Command history manager with readline integration."""
     
     def __init__(self, max_size: int = 100):
         self.max_size = max_size
+        
+        # Built once; completion walks it instead of filtering every option per call
+        self._completion_trie = TrieNode()
+        for word in COMPLETION_COMMANDS + COMPLETION_NAMESPACES:
+            self._completion_trie.insert(word)
+        # Matches for the prefix currently being completed
+        self._completion_prefix = None
+        self._completion_matches = []
+        
         self.setup_readline()
     
     def setup_readline(self):
@@ -40,17 +85,14 @@ class CommandHistory:
     
     def _completer(self, text, state):
         """Auto-completion function for commands and options."""
-        commands = [
-            'help', 'quit', 'exit', 'history', 
-            '-n', '--num-results', '-ns', '--namespace', '-h', '--help'
-        ]
-        
-        namespaces = ['S223', 'WATR', 'UNIT', 'QK', 'RDF', 'RDFS', 'OWL']
-        
-        # Combine all possible completions
-        options = commands + namespaces
-        
-        matches = [cmd for cmd in options if cmd.startswith(text)]
+        # Nothing typed yet: offer nothing rather than every command and namespace
+        if not text:
+            return None
+        # readline calls once per state with the same text; walk the trie only on state 0
+        if text != self._completion_prefix:
+            self._completion_prefix = text
+            self._completion_matches = self._completion_trie.find(text)
+        matches = self._completion_matches
         
         if state < len(matches):
             return matches[state]
@@ -66,11 +108,9 @@ class CommandHistory:
         history_length = readline.get_current_history_length()
         start = max(1, history_length - n + 1)
         
-        return [
-            readline.get_history_item(i) 
-            for i in range(start, history_length + 1)
-            if readline.get_history_item(i)
-        ]
+        # Fetch each entry once; readline returns None for missing items
+        items = (readline.get_history_item(i) for i in range(start, history_length + 1))
+        return [item for item in items if item]
     
     def clear_history(self):
         """Clear command history."""
@@ -130,42 +170,80 @@ class SearchArgumentParser:
     
     def parse(self, args_str: str):
         """Parse command string into arguments."""
+        # Plain queries without quotes or flags need neither shlex nor argparse
+        if not any(c in args_str for c in ('"', "'", "-")):
+            query = args_str.split()
+            if query:
+                return argparse.Namespace(
+                    query=query,
+                    num_results=self.parser.get_default('num_results'),
+                    namespace=None,
+                    help=False
+                )
         try:
             # Use shlex to properly handle quoted strings
             args = shlex.split(args_str)
-            return self.parser.parse_args(args)
+            # Intermixed, so options may also sit between query words ("pump -n 5 heat")
+            return self.parser.parse_intermixed_args(args)
         except (argparse.ArgumentError, SystemExit) as e:
             raise ValueError(f"Invalid arguments: {e}")
 
 
 def main():
     """Interactive command line utility for searching URIs."""
-    print("=== URI Search Utility ===")
-    print("This utility searches for URIs in the ontology using semantic similarity.")
-    print("Type 'help' for commands or 'quit' to exit.\n")
+    parser = argparse.ArgumentParser(
+        prog='find-my-uri',
+        description='Interactive semantic search for ontology URIs. '
+                    'Type \'help\' at the prompt for search commands.'
+    )
+    parser.add_argument(
+        '--batch',
+        metavar='FILE',
+        # Opened while parsing, so a missing file fails before the model is loaded
+        type=argparse.FileType('r'),
+        help='Search every line of FILE (\'-\' for stdin) in one batch and exit'
+    )
+    parser.add_argument(
+        '-n', '--num-results',
+        type=int,
+        help='Number of results per query in --batch mode (default: 3)'
+    )
+    parser.add_argument(
+        '-ns', '--namespace',
+        type=str,
+        help='Namespace abbreviation to filter by in --batch mode'
+    )
+    cli_args = parser.parse_args()
+    if cli_args.batch is None and (cli_args.num_results is not None or cli_args.namespace is not None):
+        parser.error("-n/--num-results and -ns/--namespace require --batch; "
+                     "in the interactive prompt, pass them with each search instead")
+    if cli_args.num_results is None:
+        cli_args.num_results = 3
+    
+    # Imported here so --help and usage errors do not pay for importing numpy, rdflib and pyoxigraph
+    from .core import DATA_FILES, create_finder_from_env
+    
+    if not cli_args.batch:
+        print("=== URI Search Utility ===")
+        print("This utility searches for URIs in the ontology using semantic similarity.")
+        print("Type 'help' for commands or 'quit' to exit.\n")
 
     # Initialize finder
     try:
-        # Try to use the data directory approach first
-        config = URIFinderConfig(
-            data_dir=DATA_FILES,
-            embedding_model=DEFAULT_EMBEDDING_MODEL
-        )
-        finder = URIFinder(config)
-        print("✓ Vector database loaded successfully")
-    except FileNotFoundError:
-        # Fallback to importlib.resources approach
-        try:
-            with importlib.resources.path('find_my_uri', 'vector_db') as vector_db_path:
-                config = URIFinderConfig(
-                    data_dir=vector_db_path,
-                    embedding_model=DEFAULT_EMBEDDING_MODEL
-                )
-                finder = URIFinder(config)
-                print("✓ Vector database loaded successfully")
-        except Exception as e:
-            print(f"Error loading vector database: {e}")
-            return
+        # as_file hands back a real filesystem path, extracting only if the package is zipped
+        with importlib.resources.as_file(DATA_FILES) as data_dir:
+            finder = create_finder_from_env(
+                data_dir=data_dir,
+                query_cache_path=Path.home() / '.uri_search_cache.sqlite'
+            )
+    except Exception as e:
+        print(f"Error loading vector database: {e}")
+        return
+    
+    if cli_args.batch:
+        _run_batch(finder, cli_args.batch, cli_args.namespace, cli_args.num_results)
+        return
+    print("✓ Vector database loaded successfully")
     
     # Initialize command history and parser
     history = CommandHistory()
@@ -182,6 +260,41 @@ def main():
         history.save_history(str(history_file))
 
 
+def _run_batch(finder, batch_file: TextIO, namespace: Optional[str], num_results: int):
+    """Search every non-empty line of an open file (stdin for '-') in a single batch."""
+    with batch_file:
+        lines = batch_file.read().splitlines()
+    queries = [line.strip() for line in lines if line.strip()]
+    if queries:
+        _search_and_display(finder, queries, namespace, num_results)
+
+
+def _search_and_display(finder, queries: List[str], namespace: Optional[str], num_results: int):
+    """Search for all queries with one batched encode and display each result list."""
+    # The first header goes out before searching, so a search error is reported
+    # under the query it belongs to, as with a single search
+    _print_search_header(queries[0], namespace, num_results)
+    batch_results = finder.find_similar_uris_batch(
+        queries=queries,
+        namespace=namespace,
+        n_results=num_results
+    )
+    
+    for i, (query, results) in enumerate(zip(queries, batch_results)):
+        if i:
+            _print_search_header(query, namespace, num_results)
+        _display_results(results)
+
+
+def _print_search_header(query: str, namespace: Optional[str], num_results: int):
+    """Print the header shown above the results for one query."""
+    print(f"\nSearching for: '{query}'")
+    if namespace:
+        print(f"Filtering by namespace: {namespace}")
+    print(f"Showing top {num_results} results:")
+    print("-" * 50)
+
+
 def _get_input_with_readline(prompt: str) -> str:
     """Get input with readline support if available."""
     return input(prompt)
@@ -199,17 +312,19 @@ def _run_interactive_loop(finder, history: CommandHistory, search_parser: Search
                 continue
             
             # Handle special commands
-            if user_input.lower() in ['quit', 'exit', 'q']:
+            command = user_input.lower()
+            parts = command.split()
+            if command in ['quit', 'exit', 'q']:
                 print("Goodbye!")
                 break
             
-            elif user_input.lower() in ['help', 'h']:
+            elif command in ['help', 'h']:
                 _show_help()
                 continue
             
-            elif user_input.lower().startswith('history'):
-                parts = user_input.split()
-                n = 10 if len(parts) == 1 else int(parts[1]) if parts[1].isdigit() else 10
+            # Only 'history' or 'history <n>'; anything else starting with the word is a search
+            elif parts[0] == 'history' and (len(parts) == 1 or (len(parts) == 2 and parts[1].isdigit())):
+                n = int(parts[1]) if len(parts) == 2 else 10
                 recent_history = history.get_history(n)
                 if recent_history:
                     print(f"\nLast {len(recent_history)} commands:")
@@ -219,7 +334,7 @@ def _run_interactive_loop(finder, history: CommandHistory, search_parser: Search
                     print("No commands in history")
                 continue
             
-            elif user_input.lower() == 'clear-history':
+            elif command == 'clear-history':
                 history.clear_history()
                 print("Command history cleared")
                 continue
@@ -235,22 +350,12 @@ def _run_interactive_loop(finder, history: CommandHistory, search_parser: Search
                     _show_search_help()
                     continue
                 
-                query = ' '.join(args.query)
-                
-                # Perform search
-                print(f"\nSearching for: '{query}'")
-                if args.namespace:
-                    print(f"Filtering by namespace: {args.namespace}")
-                print(f"Showing top {args.num_results} results:")
-                print("-" * 50)
-                
-                results = finder.find_similar_uris(
-                    query=query,
-                    namespace=args.namespace,
-                    n_results=args.num_results
-                )
+                # Several queries can be separated by ';' and are encoded as one batch
+                queries = [q.strip() for q in ' '.join(args.query).split(';') if q.strip()]
+                if not queries:
+                    continue
                 
-                _display_results(results)
+                _search_and_display(finder, queries, args.namespace, args.num_results)
                 
             except ValueError as e:
                 print(f"Error parsing command: {e}")
@@ -275,6 +380,7 @@ def _show_help():
     print("  history [n]          - Show last n commands (default: 10)")
     print("  clear-history        - Clear command history")
     print("  <search_term> [options] - Search for URIs")
+    print("  <term>; <term> [options] - Search for several terms at once")
     
     print("\nNavigation:")
     print("  ↑ / ↓                - Navigate command history")
@@ -296,6 +402,7 @@ def _show_help():
     print("  temperature")
     print("  flow rate -n 10")
     print("  pump -ns S223")
+    print("  pump; fan; valve -ns S223")
     print("  \"heat exchanger\" --namespace WATR --num-results 5")
 
 
@@ -321,46 +428,35 @@ def _show_search_help():
     print("  \"heat exchanger\"")
     print("  pump --namespace S223 --num-results 5")
     print("  meter -ns UNIT -n 8")
+    print("  celsius; kelvin -ns UNIT")
 
 
 def _display_results(results):
     """Display search results in a formatted way."""
     if results:
+        # Collect the whole listing and write it once instead of print() per line
+        parts = []
         for i, result in enumerate(results, 1):
-            # Handle different result formats based on your URIFinder implementation
-            if isinstance(result, dict):
-                local_name = result.get('local_name', 'Unknown')
-                uri = result.get('uri', 'Unknown')
-                label = result.get('label', '')
-                comment = result.get('comment', None)
-                namespace = result.get('namespace', '')
-                parents = result.get('parents', None)
-                
-                # Try to get namespace abbreviation
-                from .core import NAMESPACE_MAP
-                namespace_abbrev = None
-                for full_ns, abbrev in NAMESPACE_MAP.items():
-                    if namespace.startswith(full_ns):
-                        namespace_abbrev = abbrev
-                        break
-                namespace_display = namespace_abbrev or namespace
-                
-                print(f"{i:2d}. {local_name}")
-                # print(f"    URI: {uri}")
-                print(f"    Namespace: {namespace_display}")
-                if label and label != local_name:
-                    print(f"    Label: {label}")
-                if comment:
-                    print(f"    Comment: {comment}")
-                if parents:
-                    print(f"    Parents: {parents}")
-                
-                # If similarity score is available
-                if 'similarity_score' in result:
-                    print(f"    Similarity: {result['similarity_score']:.3f}")
-                print()
-            else:
-                print(f"{i:2d}. {result}")
+            local_name = result.local_name
+            label = result.label
+            comment = result.comment
+            parents = result.parents
+            
+            parts.append(_RESULT_TMPL.format(
+                index=i,
+                local_name=local_name,
+                namespace=result.namespace_abbrev
+            ))
+            if label and label != local_name:
+                parts.append(_LABEL_TMPL.format(label))
+            if comment:
+                parts.append(_COMMENT_TMPL.format(comment))
+            if parents:
+                parts.append(_PARENTS_TMPL.format(parents))
+            parts.append(_SIMILARITY_TMPL.format(result.similarity_score))
+            parts.append('\n')
+        sys.stdout.write(''.join(parts))
+        sys.stdout.flush()
     else:
         print("No results found.")
         print("Try:")
@@ -1,18 +1,47 @@
-from sentence_transformers import SentenceTransformer
 from pathlib import Path
-import pickle
+import json
+import numpy as np
 import os
-import glob
-from typing import List, Dict, Tuple, Optional, Union
+import re
+import sys
+import sqlite3
+import threading
+import functools
+from typing import Callable, List, Dict, Tuple, Optional, Union, TYPE_CHECKING
 from rdflib import Graph, Namespace, URIRef, Literal
+import pyoxigraph
 from dataclasses import dataclass
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pprint import pprint
 from importlib.resources import files
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
 DATA_FILES = files("find_my_uri").joinpath("data")
 
 DEFAULT_EMBEDDING_MODEL = "paraphrase-MiniLM-L3-v2" # or 'all-MiniLM-L6-v2'
 # DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
+# sentence-transformers backend: "torch", "onnx" or "openvino"
+DEFAULT_EMBEDDING_BACKEND = "torch"
+
+# Number of texts sent through the embedding model per forward pass
+ENCODE_BATCH_SIZE = 64
+
+# Number of documents encoded per chunk when building the embedding matrix
+ENCODE_CHUNK_SIZE = 256
+
+# load_ttl_files parses in worker processes when there are more files than this
+PARALLEL_PARSE_MIN_FILES = 4
+
+# Number of query embeddings URIFinder keeps around for repeated searches
+QUERY_CACHE_SIZE = 512
+
+# Number of query embeddings kept in the optional on-disk cache; oldest are dropped first
+QUERY_DISK_CACHE_SIZE = 10000
+
 """
 SPARQL-based URI finder using vector database for class name matching.
 
@@ -28,6 +57,7 @@ S223 = Namespace("http://data.ashrae.org/standard223#")
 WATR = Namespace("urn:nawi-water-ontology#")
 UNIT = Namespace("http://qudt.org/vocab/unit/")
 QK = Namespace("http://qudt.org/vocab/quantitykind/")
+QUDT = Namespace("http://qudt.org/schema/qudt/")
 
 # Namespace mapping for abbreviations
 NAMESPACE_MAP = {
@@ -43,6 +73,218 @@ NAMESPACE_MAP = {
 # Reverse mapping for lookup
 ABBREV_TO_NAMESPACE = {v: k for k, v in NAMESPACE_MAP.items()}
 
+# Matches the longest known namespace a URI starts with
+NAMESPACE_PREFIX_RE = re.compile(
+    '|'.join(re.escape(ns) for ns in sorted(NAMESPACE_MAP, key=len, reverse=True))
+)
+
+
+def namespace_abbrev(namespace: str) -> str:
+    """Get the abbreviation of the known namespace a namespace or URI starts with."""
+    match = NAMESPACE_PREFIX_RE.match(namespace)
+    return NAMESPACE_MAP[match.group()] if match else namespace
+
+
+def _split_uri(uri: str) -> Tuple[str, str]:
+    """Split a URI into its namespace and local name at the last '#' (or '/')."""
+    namespace, sep, local_name = uri.rpartition('#')
+    if not sep:
+        namespace, sep, local_name = uri.rpartition('/')
+        if not sep:
+            return uri, uri
+    return namespace + sep, local_name
+
+
+# Class types to extract, with the rdfs:label language to keep (None keeps every label)
+EXTRACTED_CLASS_TYPES = [
+    (S223.Class, None),
+    (WATR.Class, None),
+    (QUDT.Unit, "en"),
+    (QUDT.QuantityKind, "en"),
+]
+
+# Predicates used by class extraction; all other triples are dropped while parsing
+EXTRACTED_PREDICATES = frozenset(
+    pyoxigraph.NamedNode(str(predicate))
+    for predicate in (RDF.type, RDFS.label, RDFS.comment, RDFS.subClassOf)
+)
+
+
+def read_extraction_triples(file_path: Path) -> bytes:
+    """
+    Stream-parse a Turtle file, keeping only the triples class extraction needs.
+    
+    Triples are filtered as the parser emits them, so the full file is never
+    held as a graph.
+    
+    Returns:
+        The kept triples serialized as N-Triples
+    """
+    quads = pyoxigraph.parse(
+        path=file_path,
+        format=pyoxigraph.RdfFormat.TURTLE,
+        base_iri=file_path.resolve().as_uri(),
+        rename_blank_nodes=True
+    )
+    return pyoxigraph.serialize(
+        (quad.triple for quad in quads if quad.predicate in EXTRACTED_PREDICATES),
+        format=pyoxigraph.RdfFormat.N_TRIPLES
+    )
+
+
+def get_embedding_model(
+    model_name: str,
+    backend: str = DEFAULT_EMBEDDING_BACKEND,
+    model_file: Optional[str] = None,
+    device: Optional[str] = None
+) -> "SentenceTransformer":
+    """
+    Load a SentenceTransformer model, sharing one instance per model configuration.
+    
+    URIEncoder and URIFinder created in the same process reuse the same weights
+    instead of each loading their own copy.
+    
+    Args:
+        model_name: Model name or path
+        backend: Inference backend ("torch", "onnx" or "openvino")
+        model_file: Specific exported model file to load with the onnx/openvino
+            backend, e.g. "onnx/model_qint8_avx512_vnni.onnx" for int8 weights
+        device: Device to run on, e.g. "cuda" or "cpu"; None lets
+            sentence-transformers pick CUDA/MPS when available
+    """
+    # Always key the cache on every argument, so get_embedding_model(name) and
+    # get_embedding_model(name, DEFAULT_EMBEDDING_BACKEND) share one instance
+    return _load_embedding_model(model_name, backend, model_file, device)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_embedding_model(
+    model_name: str,
+    backend: str,
+    model_file: Optional[str],
+    device: Optional[str]
+) -> "SentenceTransformer":
+    # Imported here because it pulls in torch, which takes seconds; importing this
+    # module (e.g. for its namespace helpers) should not pay for that
+    from sentence_transformers import SentenceTransformer
+    
+    num_threads = os.getenv("TORCH_NUM_THREADS")
+    if num_threads and backend == "torch":
+        # torch defaults to one intra-op thread per physical core, which is not
+        # always best for small batches or on shared machines
+        import torch
+        torch.set_num_threads(int(num_threads))
+    
+    model_kwargs = {"file_name": model_file} if model_file else None
+    return SentenceTransformer(model_name, device=device, backend=backend, model_kwargs=model_kwargs)
+
+
+def export_onnx_model(
+    model_name: str,
+    output_dir: Path,
+    optimization_level: Optional[str] = "O3",
+    quantization: Optional[str] = None
+) -> Path:
+    """
+    Export the embedding model to ONNX for faster CPU inference.
+    
+    The export is written to output_dir together with the tokenizer and pooling
+    config. Load it by passing output_dir as the embedding model with the "onnx"
+    backend and the exported file as the model file, e.g. "onnx/model_O3.onnx" or
+    "onnx/model_qint8_avx512_vnni.onnx". Requires sentence-transformers[onnx].
+    
+    Args:
+        model_name: Model name or path to export
+        output_dir: Directory to write the exported model to
+        optimization_level: ONNX Runtime graph optimization level ("O1"-"O4"),
+            written as onnx/model_<level>.onnx; None skips it
+        quantization: Dynamic int8 quantization target ("arm64", "avx2",
+            "avx512" or "avx512_vnni"); None skips it
+    
+    Returns:
+        output_dir
+    """
+    from sentence_transformers import (
+        SentenceTransformer, export_dynamic_quantized_onnx_model, export_optimized_onnx_model
+    )
+    
+    output_dir = Path(output_dir)
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save_pretrained(str(output_dir))
+    if optimization_level:
+        export_optimized_onnx_model(model, optimization_level, str(output_dir))
+    if quantization:
+        export_dynamic_quantized_onnx_model(model, quantization, str(output_dir))
+    return output_dir
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the indices and values of the k highest scores in each row, best first.
+    
+    Uses argpartition, which is O(N) per row, and only sorts the selected k.
+    Partitioning at N - k instead of on -scores avoids a negated copy of the
+    whole score matrix.
+    """
+    n = scores.shape[1]
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp), np.empty((scores.shape[0], 0), dtype=scores.dtype)
+    top = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    # Sort just the k selected scores, descending
+    order = np.argsort(top_scores, axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def replace_file(path: Path, write):
+    """
+    Write a file by calling write(f) on a temporary sibling, then renaming it over path.
+    
+    Readers never see a half-written file, and a URIFinder that has the old
+    embeddings memory-mapped keeps reading the old (unlinked) file instead of
+    one truncated underneath it.
+    """
+    replace_files({path: write})
+
+
+def replace_files(writes: Dict[Path, Callable]):
+    """
+    Like replace_file for several files: every temporary file is written before any is renamed.
+    
+    A failure while writing leaves all the old files in place, and the renames run
+    back to back, so the window in which a reader can see a new file next to an
+    old one is only as long as the renames themselves.
+    """
+    tmp_paths = {}
+    for path, write in writes.items():
+        tmp_paths[path] = path.with_name(path.name + '.tmp')
+        with open(tmp_paths[path], 'wb') as f:
+            write(f)
+    for path, tmp_path in tmp_paths.items():
+        os.replace(tmp_path, path)
+
+
+def _embeddings_writer(embeddings) -> Callable:
+    """Get a replace_file writer that saves embeddings as float32 .npy."""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    return lambda f: np.save(f, embeddings)
+
+
+def save_embeddings(embeddings, path: Path):
+    """Save embeddings as a float32 .npy file."""
+    replace_file(path, _embeddings_writer(embeddings))
+
+
+def load_embeddings(path: Path):
+    """
+    Load embeddings saved with save_embeddings.
+
+    The file is memory-mapped read-only, so pages are only read from disk as
+    they are touched instead of materializing the whole matrix up front.
+    """
+    return np.load(path, mmap_mode='r')
+
 
 @dataclass
 class URIEncoderConfig:
@@ -50,7 +292,15 @@ class URIEncoderConfig:
     ttl_directories: List[Path]
     data_dir: Path = Path("data")
     embedding_model: str = DEFAULT_EMBEDDING_MODEL
+    embedding_backend: str = DEFAULT_EMBEDDING_BACKEND
+    embedding_model_file: Optional[str] = None
+    # Device for building the index (None picks CUDA/MPS when available)
+    embedding_device: Optional[str] = None
+    # Documents per forward pass; larger batches pay off on GPU
+    encode_batch_size: int = ENCODE_BATCH_SIZE
     file_patterns: List[str] = None
+    # Worker processes for parsing TTL files (None uses one per CPU, 1 parses in-process)
+    parse_workers: Optional[int] = None
     
     def __post_init__(self):
         if self.file_patterns is None:
@@ -82,6 +332,9 @@ class URIEncoder:
         self.class_data = []
         self.client = None
         self.collection = None
+        # Document text -> its row in self.embeddings, so a repeated store_vectors
+        # call reuses earlier embeddings instead of encoding them again
+        self._document_rows = {}
         
         # Bind common namespaces
         self.graph.bind("rdf", RDF)
@@ -89,8 +342,22 @@ class URIEncoder:
         self.graph.bind("owl", OWL)
         self.graph.bind("s223", S223)
         self.graph.bind("watr", WATR)
+        self.graph.bind("qudt", QUDT)
         
-        self.embedding_model = SentenceTransformer(self.config.embedding_model)
+        # Loaded on first use, so loading and extracting ontologies does not wait on it
+        self._embedding_model = None
+    
+    @property
+    def embedding_model(self) -> "SentenceTransformer":
+        """The sentence embedding model, loaded (or shared from the cache) on first use."""
+        if self._embedding_model is None:
+            self._embedding_model = get_embedding_model(
+                self.config.embedding_model,
+                self.config.embedding_backend,
+                self.config.embedding_model_file,
+                self.config.embedding_device
+            )
+        return self._embedding_model
     
     def load_ttl_files(self) -> int:
         """
@@ -99,113 +366,114 @@ class URIEncoder:
         Returns:
             Number of files loaded
         """
-        files_loaded = 0
-        
+        file_paths = []
         for directory in self.config.ttl_directories:
             if not directory.exists():
                 print(f"Directory {directory} does not exist, skipping")
                 continue
                 
             for pattern in self.config.file_patterns:
-                # Use pathlib's glob for recursive search
-                files = list(directory.rglob(pattern))
-                
-                for file_path in files:
-                    try:
-                        print(f"Loading {file_path}")
-                        self.graph.parse(str(file_path), format="turtle")
-                        files_loaded += 1
-                    except Exception as e:
-                        print(f"Failed to load {file_path}: {e}")
+                # Collected up front, since the parse pool needs every path before submitting
+                file_paths.extend(directory.rglob(pattern))
+        
+        if len(file_paths) > PARALLEL_PARSE_MIN_FILES and self.config.parse_workers != 1:
+            # Parsing is CPU-bound, so spread the files over processes and only
+            # ship the filtered N-Triples back to be merged into the graph
+            with ProcessPoolExecutor(max_workers=self.config.parse_workers) as pool:
+                futures = [pool.submit(read_extraction_triples, file_path) for file_path in file_paths]
+                files_loaded = sum(
+                    self._add_extraction_triples(file_path, future.result)
+                    for file_path, future in zip(file_paths, futures)
+                )
+        else:
+            files_loaded = sum(
+                self._add_extraction_triples(file_path, functools.partial(read_extraction_triples, file_path))
+                for file_path in file_paths
+            )
                         
         print(f"Loaded {files_loaded} TTL files into graph")
         return files_loaded
     
+    def _add_extraction_triples(self, file_path: Path, read_triples) -> bool:
+        """Merge the N-Triples returned by read_triples() into the graph; False if the file failed."""
+        try:
+            print(f"Loading {file_path}")
+            # Non-transactional bulk_load into the Oxigraph store skips per-triple
+            # transaction bookkeeping; the graph is only read after loading finishes
+            self.graph.parse(data=read_triples(), format="ox-ntriples", transactional=False)
+            return True
+        except Exception as e:
+            print(f"Failed to load {file_path}: {e}")
+            return False
+    
     def extract_classes_with_sparql(self) -> List[Dict]:
         """
-        Extract class information using SPARQL queries.
+        Extract class information from the graph.
+        
+        Equivalent to a SPARQL UNION over the class types in EXTRACTED_CLASS_TYPES,
+        but answered with direct rdf:type / rdfs:label / rdfs:comment index lookups
+        instead of going through the SPARQL evaluator.
         
         Returns:
-            List of dictionaries containing class information
-        """
-        # SPARQL query to extract classes with labels and comments
-        query = """
-        SELECT DISTINCT 
-        ?klass 
-        ?label 
-        ?comment 
-        WHERE {
-            { ?klass a s223:Class ;
-                rdfs:label ?label } 
-            UNION 
-            { ?klass a watr:Class ;
-                rdfs:label ?label }
-            UNION 
-            { ?klass a qudt:Unit ;
-                rdfs:label ?label 
-                FILTER (lang(?label) = "en")} 
-            UNION 
-            { ?klass a qudt:QuantityKind ;
-                rdfs:label ?label 
-                FILTER (lang(?label) = "en") }
-
-            BIND("rdfs:Class" as ?type)
-            
-            OPTIONAL { ?klass rdfs:label ?label }
-            OPTIONAL { ?klass rdfs:comment ?comment }
-        }
-        ORDER BY ?klass
+            List of dictionaries containing class information, ordered by class URI
         """
+        rows = {}
+        for class_type, language in EXTRACTED_CLASS_TYPES:
+            for klass in self.graph.subjects(RDF.type, class_type):
+                labels = [
+                    label for label in self.graph.objects(klass, RDFS.label)
+                    if language is None or getattr(label, 'language', None) == language
+                ]
+                if not labels:
+                    continue
+                comments = list(self.graph.objects(klass, RDFS.comment)) or [None]
+                # Same row identity as SELECT DISTINCT ?klass ?label ?comment
+                for label in labels:
+                    for comment in comments:
+                        rows.setdefault((klass, label, comment), None)
         
         classes = []
-        try:
-            results = self.graph.query(query)
-            
-            for row in results:
-                class_uri = str(row.klass)
-                label = str(row.label) if row.label else self._extract_local_name(class_uri)
-                comment = str(row.comment) if row.comment else ""
-
+        parents_cache = {}
+        for klass, label, comment in sorted(rows, key=lambda row: str(row[0])):
+            class_uri = str(klass)
+            namespace, local_name = _split_uri(class_uri)
+            if klass not in parents_cache:
                 # These should be the 'interesting' parents, other than class, concept, etc.
-                parents = [self._extract_local_name(uri) for uri in self.graph.objects(row.klass, RDFS['subClassOf']*'+')][:-2]
-
-                class_info = {
-                    'uri': class_uri,
-                    'label': label,
-                    'local_name': self._extract_local_name(class_uri),
-                    'comment':comment,
-                    'namespace': self._extract_namespace(class_uri),
-                    'parents': ', '.join(parents)
-                }
-                classes.append(class_info)
-                
-            print(f"Extracted {len(classes)} classes from ontology")
+                parents = [_split_uri(uri)[1] for uri in self._superclasses(klass)][:-2]
+                parents_cache[klass] = ', '.join(parents)
             
-        except Exception as e:
-            print(f"SPARQL query failed: {e}")
+            class_info = {
+                'uri': class_uri,
+                'label': str(label) if label else local_name,
+                'local_name': local_name,
+                'comment': str(comment) if comment else "",
+                'namespace': namespace,
+                'parents': parents_cache[klass]
+            }
+            classes.append(class_info)
             
+        print(f"Extracted {len(classes)} classes from ontology")
         return classes
     
-    def _extract_local_name(self, uri: str) -> str:
-        """Extract the local name from a URI."""
-        if '#' in uri:
-            return uri.split('#')[-1]
-        elif '/' in uri:
-            return uri.split('/')[-1]
-        return uri
-    
-    def _extract_namespace(self, uri: str) -> str:
-        """Extract the namespace from a URI."""
-        if '#' in uri:
-            return uri.split('#')[0] + '#'
-        elif '/' in uri:
-            parts = uri.split('/')
-            return '/'.join(parts[:-1]) + '/'
-        return uri
-    
-    def _get_namespace_abbrev(self, namespace: str) -> str:
-        """Get namespace abbreviation from full namespace URI."""
-        return NAMESPACE_MAP.get(namespace, namespace)
+    def _superclasses(self, klass) -> List:
+        """
+        Get the rdfs:subClassOf+ closure of klass, in depth-first discovery order.
+        
+        Same result as evaluating the rdfs:subClassOf+ property path, but with
+        plain triple lookups instead of going through rdflib's path evaluator.
+        """
+        superclasses = {}
+        expanded = set()
+        
+        def visit(node):
+            expanded.add(node)
+            for parent in self.graph.objects(node, RDFS.subClassOf):
+                superclasses.setdefault(parent, None)
+                if parent not in expanded:
+                    visit(parent)
+        
+        visit(klass)
+        return list(superclasses)
     
     def store_vectors(self, save: bool = True) -> int:
         """
@@ -218,44 +486,85 @@ class URIEncoder:
             Number of items added to the database
         """
         # Extract classes and properties
-        classes = self.extract_classes_with_sparql()
-        items = classes.copy()
+        items = self.extract_classes_with_sparql()
 
         if not items:
             print("No classes or properties found to add to vector database")
             return 0
         
-        # Prepare data for vector database
-        documents = []
-        metadatas = []
-        ids = []
+        # Keep the first row per URI; extraction returns one row per label/comment pair
+        unique_items = {}
+        for item in items:
+            unique_items.setdefault(item['uri'], item)
+        
+        # Some redundancy in documents and metadatas, just so I don't have to merge data later. 
+        # Rows are grouped by namespace (stable, otherwise in extraction order), so each
+        # namespace is one contiguous block of the saved matrix that URIFinder can
+        # slice without copying
+        namespace_order = {}
+        for item in unique_items.values():
+            namespace_order.setdefault(item['namespace'], len(namespace_order))
+        metadatas = sorted(unique_items.values(), key=lambda item: namespace_order[item['namespace']])
+        # Create searchable text combining label, local name, and comment
+        documents = [
+            f"{item['local_name']}: {item['label']}, {item['parents']}, {item['comment']}"
+            for item in metadatas
+        ]
         
-        for i, item in enumerate(items):
-            # Create searchable text combining label, local name, and comment
-            id = item['uri']
-            if id in ids:
-                continue
-                
-            searchable_text = f"{item['local_name']}: {item['label']}, {item['parents']}, {item['comment']}"
-            print(searchable_text)
-            documents.append(searchable_text)
-            
-            # Some redundancy in documents and metadatas, just so I don't have to merge data later. 
-            metadatas.append(item)
-            ids.append(item['uri'])
-            
         self.metadatas = metadatas
         self.documents = documents
-        self.embeddings = self.embedding_model.encode(documents)
+        # Each distinct document is encoded once, into its first row; later duplicates
+        # are copied, and documents embedded by an earlier store_vectors call are
+        # taken from the previous matrix
+        first_rows = {}
+        for row, doc in enumerate(documents):
+            first_rows.setdefault(doc, row)
+        previous_rows = self._document_rows
+        reused_documents = [doc for doc in first_rows if doc in previous_rows]
+        new_documents = [doc for doc in first_rows if doc not in previous_rows]
+        # Sort by length so each chunk (and each batch within it) holds similarly long
+        # texts and wastes little compute on padding; rows are written by index, so
+        # no inverse permutation is needed
+        new_documents.sort(key=len, reverse=True)
+        
+        dim = (
+            self.embedding_model.get_sentence_embedding_dimension() if new_documents
+            else self.embeddings.shape[1]
+        )
+        # Encode in chunks straight into one preallocated matrix, so peak memory is
+        # the final matrix plus a single chunk
+        embeddings = np.empty((len(documents), dim), dtype=np.float32)
+        if reused_documents:
+            embeddings[[first_rows[doc] for doc in reused_documents]] = \
+                self.embeddings[[previous_rows[doc] for doc in reused_documents]]
+        for start in range(0, len(new_documents), ENCODE_CHUNK_SIZE):
+            chunk = new_documents[start:start + ENCODE_CHUNK_SIZE]
+            # Stored unit-length, so cosine similarity at query time is a plain dot product
+            embeddings[[first_rows[doc] for doc in chunk]] = self.embedding_model.encode(
+                chunk,
+                batch_size=self.config.encode_batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+        if len(first_rows) < len(documents):
+            duplicate_rows = [row for row, doc in enumerate(documents) if first_rows[doc] != row]
+            embeddings[duplicate_rows] = embeddings[[first_rows[documents[row]] for row in duplicate_rows]]
+        self._document_rows = first_rows
+        self.embeddings = embeddings
+        print(f"Encoded {len(new_documents)} new documents, {len(documents)} URIs in total")
 
         if save:
-            metadata_path = self.config.data_dir / 'document_metadata.pickle'
-            embeddings_path = self.config.data_dir / 'embeddings.pickle'
+            metadata_path = self.config.data_dir / 'document_metadata.json'
+            embeddings_path = self.config.data_dir / 'embeddings.npy'
             
-            with open(metadata_path, 'wb') as f:
-                pickle.dump(self.metadatas, f)
-            with open(embeddings_path, 'wb') as f:
-                pickle.dump(self.embeddings, f)
+            # JSON rather than pickle, so loading the store cannot execute code.
+            # Both files are written before either is renamed, so a failure part-way
+            # through keeps the old pair; URIFinder rejects a mismatched pair
+            replace_files({
+                embeddings_path: _embeddings_writer(self.embeddings),
+                metadata_path: lambda f: f.write(json.dumps(self.metadatas).encode('utf-8'))
+            })
 
         return len(items)
 
@@ -265,6 +574,83 @@ class URIFinderConfig:
     """Configuration for URIFinder"""
     data_dir: Path = Path("data")
     embedding_model: str = DEFAULT_EMBEDDING_MODEL
+    # Query embeddings must stay comparable to the stored ones, so only swap the
+    # backend/model file, e.g. to an int8 ONNX export of the same model
+    embedding_backend: str = DEFAULT_EMBEDDING_BACKEND
+    embedding_model_file: Optional[str] = None
+    # Number of query embeddings (and result lists) kept in memory
+    query_cache_size: int = QUERY_CACHE_SIZE
+    # SQLite file that keeps query embeddings across sessions (None disables it)
+    query_cache_path: Optional[Path] = None
+    
+    def __post_init__(self):
+        if self.query_cache_size < 0:
+            raise ValueError(f"query_cache_size must be 0 or more, got {self.query_cache_size}")
+
+
+class QueryEmbeddingDiskCache:
+    """
+    SQLite-backed query -> embedding store, so repeat sessions skip the model.
+    
+    Entries are keyed by the model configuration as well as the query text, since
+    embeddings from different models or backends are not interchangeable.
+    """
+    
+    def __init__(self, path: Path, model_key: str, max_size: int = QUERY_DISK_CACHE_SIZE):
+        self.model_key = model_key
+        self.max_size = max_size
+        # Usable from any thread (calls are serialized by the lock), and a short lock
+        # timeout, since a cache held by another session is better skipped than waited on
+        self.connection = sqlite3.connect(path, timeout=0.1, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings "
+            "(model TEXT, query TEXT, embedding BLOB, PRIMARY KEY (model, query))"
+        )
+    
+    def get_many(self, queries: List[str]) -> Dict[str, np.ndarray]:
+        """Get the stored embeddings for whichever of the queries are cached."""
+        found = {}
+        # Stay below SQLite's limit on bound parameters per statement
+        with self.lock:
+            for start in range(0, len(queries), 500):
+                chunk = queries[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f"SELECT query, embedding FROM query_embeddings WHERE model = ? AND query IN ({placeholders})",
+                    [self.model_key, *chunk]
+                )
+                found.update((query, np.frombuffer(blob, dtype=np.float32)) for query, blob in rows)
+        return found
+    
+    def put_many(self, queries: List[str], embeddings: np.ndarray):
+        """Store embeddings for the queries, evicting the oldest entries beyond max_size."""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?)",
+                [
+                    (self.model_key, query, embedding.astype(np.float32).tobytes())
+                    for query, embedding in zip(queries, embeddings)
+                ]
+            )
+            self.connection.execute(
+                "DELETE FROM query_embeddings WHERE rowid NOT IN "
+                "(SELECT rowid FROM query_embeddings ORDER BY rowid DESC LIMIT ?)",
+                (self.max_size,)
+            )
+
+
+@dataclass(frozen=True, slots=True)
+class URIResult:
+    """A search hit: the stored class metadata plus its namespace abbreviation and score."""
+    uri: str
+    label: str
+    local_name: str
+    comment: str
+    namespace: str
+    parents: str
+    namespace_abbrev: str
+    similarity_score: float
 
 
 class URIFinder:
@@ -272,14 +658,44 @@ class URIFinder:
         self.config = config
         self.client = None
         self.collection = None
-        self.embedding_model = SentenceTransformer(self.config.embedding_model)
+        # Loaded on first use; searches answered from the caches never need it
+        self._embedding_model = None
+        # LRU cache of query -> embedding, so repeated searches skip the model
+        self._query_cache = OrderedDict()
+        # LRU cache of (query, namespace, n_results) -> results, so repeated searches skip ranking too
+        self._result_cache = OrderedDict()
+        self._result_cache_hits = 0
+        self._result_cache_misses = 0
+        self._lock = threading.Lock()
+        self._disk_cache = None
+        if self.config.query_cache_path is not None:
+            model_key = "|".join((
+                self.config.embedding_model,
+                self.config.embedding_backend,
+                self.config.embedding_model_file or ""
+            ))
+            try:
+                self._disk_cache = QueryEmbeddingDiskCache(self.config.query_cache_path, model_key)
+            except sqlite3.Error as e:
+                print(f"Warning: Could not open query cache {self.config.query_cache_path}: {e}")
         
         self._init_store()
         
+    @property
+    def embedding_model(self) -> "SentenceTransformer":
+        """The sentence embedding model, loaded (or shared from the cache) on first use."""
+        if self._embedding_model is None:
+            self._embedding_model = get_embedding_model(
+                self.config.embedding_model,
+                self.config.embedding_backend,
+                self.config.embedding_model_file
+            )
+        return self._embedding_model
+    
     def _init_store(self):
         """Initialize the store by loading saved data."""
-        metadata_path = self.config.data_dir / 'document_metadata.pickle'
-        embeddings_path = self.config.data_dir / 'embeddings.pickle'
+        metadata_path = self.config.data_dir / 'document_metadata.json'
+        embeddings_path = self.config.data_dir / 'embeddings.npy'
         
         if not metadata_path.exists() or not embeddings_path.exists():
             raise FileNotFoundError(
@@ -288,29 +704,78 @@ class URIFinder:
             )
         
         with open(metadata_path, 'rb') as f:
-            self.metadatas = pickle.load(f)
-        with open(embeddings_path, 'rb') as f:
-            self.embeddings = pickle.load(f)
-    
-    def _resolve_namespace_filter(self, namespace_input: str) -> str:
-        """Resolve namespace input to full namespace URI."""
-        # If it's an abbreviation, convert to full namespace
-        if namespace_input in ABBREV_TO_NAMESPACE:
-            return ABBREV_TO_NAMESPACE[namespace_input]
-        # If it's already a full namespace, return as is
-        return namespace_input
+            self.metadatas = json.load(f)
+        self.embeddings = load_embeddings(embeddings_path)
+        if len(self.metadatas) != self.embeddings.shape[0]:
+            raise ValueError(
+                f"{metadata_path} describes {len(self.metadatas)} URIs but {embeddings_path} "
+                f"holds {self.embeddings.shape[0]} embeddings; rebuild them with URIEncoder.store_vectors()."
+            )
+        
+        # Row indices per namespace, so namespace filtering does not rescan the metadata
+        namespace_indices = {}
+        for i, metadata in enumerate(self.metadatas):
+            # Only a handful of distinct namespaces, so share one string object per namespace
+            metadata['namespace'] = sys.intern(metadata['namespace'])
+            namespace_indices.setdefault(metadata['namespace'], []).append(i)
+        self.namespace_indices = {ns: np.array(indices) for ns, indices in namespace_indices.items()}
+        # store_vectors saves each namespace as one contiguous block of rows, so its
+        # embeddings are a plain slice of the memory map (a view, no copy); stores
+        # written before that fall back to gathering the rows per query
+        self.namespace_embeddings = {
+            ns: self.embeddings[indices[0]:indices[-1] + 1]
+            for ns, indices in self.namespace_indices.items()
+            if indices[-1] - indices[0] + 1 == len(indices)
+        }
+        # Abbreviation per namespace, resolved once instead of per result row
+        self.namespace_abbrevs = {ns: namespace_abbrev(ns) for ns in self.namespace_indices}
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode queries, reusing embeddings cached in memory or on disk for queries seen before."""
+        cache = self._query_cache
+        missing = [q for q in dict.fromkeys(queries) if q not in cache]
+        if missing and self._disk_cache is not None:
+            cache.update(self._use_disk_cache(self._disk_cache.get_many, missing) or {})
+            missing = [q for q in missing if q not in cache]
+        if missing:
+            new_embeddings = self.embedding_model.encode(
+                missing, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True
+            )
+            for query, embedding in zip(missing, new_embeddings):
+                cache[query] = embedding
+            if self._disk_cache is not None:
+                self._use_disk_cache(self._disk_cache.put_many, missing, new_embeddings)
+        for query in queries:
+            cache.move_to_end(query)
+        query_embeddings = np.stack([cache[q] for q in queries])
+        while len(cache) > self.config.query_cache_size:
+            cache.popitem(last=False)
+        return query_embeddings
+    
+    def _use_disk_cache(self, method, *args):
+        """
+        Call a QueryEmbeddingDiskCache method, turning the cache off if SQLite fails.
+        
+        The cache is optional, so a locked, read-only or full database only costs
+        the speed-up, never the search results.
+        """
+        try:
+            return method(*args)
+        except sqlite3.Error as e:
+            print(f"Warning: Query cache {self.config.query_cache_path} disabled: {e}")
+            self._disk_cache = None
+            return None
     
     def filter_embeddings_ns(self, desired_namespace: str):
-        matching_indices = [i for i, d in enumerate(self.metadatas) if d['namespace'] == desired_namespace]
-        if len(matching_indices) == 0:
+        matching_indices = self.namespace_indices.get(desired_namespace)
+        if matching_indices is None:
             raise Exception(f'No documents in this namespace {desired_namespace}')
-        return self.embeddings[matching_indices], matching_indices
+        embeddings = self.namespace_embeddings.get(desired_namespace)
+        if embeddings is None:
+            embeddings = self.embeddings[matching_indices]
+        return embeddings, matching_indices
     
-    def _get_namespace_abbrev(self, namespace: str) -> str:
-        """Get namespace abbreviation from full namespace URI."""
-        return NAMESPACE_MAP.get(namespace, namespace)
-
-    def find_similar_uris(self, query: str, namespace: str = None, n_results: int = 5) -> List[Dict]:
+    def find_similar_uris(self, query: str, namespace: str = None, n_results: int = 5) -> List["URIResult"]:
         """
         Find URIs similar to the given query string.
         
@@ -320,32 +785,91 @@ class URIFinder:
             n_results: Number of results to return
             
         Returns:
-            List of dictionaries containing similar URIs and metadata
+            List of URIResult objects for the most similar URIs
+        """
+        return self.find_similar_uris_batch([query], namespace=namespace, n_results=n_results)[0]
+
+    def find_similar_uris_batch(self, queries: List[str], namespace: str = None, n_results: int = 5) -> List[List["URIResult"]]:
         """
+        Find URIs similar to each of the given query strings.
         
-        try:
-            if namespace:
-                # Resolve namespace abbreviation to full URI
-                if namespace not in ABBREV_TO_NAMESPACE.keys():
-                    raise ValueError(f"Namespace not known: {namespace}")
-                resolved_namespace = self._resolve_namespace_filter(namespace)
-                embeddings, filtered_indices = self.filter_embeddings_ns(str(resolved_namespace)) 
-            else:
-                embeddings = self.embeddings
-                filtered_indices = None
-
-            similarities = self.embedding_model.similarity(embeddings, self.embedding_model.encode(query)).squeeze(1)
-            topk_indices = similarities.topk(n_results).indices
-            if filtered_indices:
-                indices = [filtered_indices[i] for i in topk_indices.tolist()]
-            else:
-                indices = topk_indices.tolist()
-            metadata_matches = [self.metadatas[i] for i in indices]
-            return metadata_matches
+        All queries are encoded in a single forward pass of the embedding model.
+        
+        Args:
+            queries: Search query strings
+            namespace: Namespace filter (can be abbreviation like 'S223' or full URI)
+            n_results: Number of results to return per query
             
-        except Exception as e:
-            print(f"Failed to find similar URIs: {e}")
-            return []
+        Returns:
+            List with one list of URIResult objects per query. Results are cached,
+            so the same (immutable) objects are returned for repeated queries.
+        """
+        
+        # One search at a time, so the LRU caches and counters can be shared across threads
+        with self._lock:
+            cache = self._result_cache
+            keys = [(query, namespace, n_results) for query in queries]
+            try:
+                missing = [key for key in dict.fromkeys(keys) if key not in cache]
+                if missing:
+                    results = self._search([key[0] for key in missing], namespace, n_results)
+                    for key, result in zip(missing, results):
+                        cache[key] = tuple(result)
+            except Exception as e:
+                print(f"Failed to find similar URIs: {e}")
+                return [[] for _ in queries]
+        
+            self._result_cache_hits += len(keys) - len(missing)
+            self._result_cache_misses += len(missing)
+            for key in keys:
+                cache.move_to_end(key)
+            batch_results = [list(cache[key]) for key in keys]
+            while len(cache) > self.config.query_cache_size:
+                cache.popitem(last=False)
+            return batch_results
+    
+    def _search(self, queries: List[str], namespace: Optional[str], n_results: int) -> List[List["URIResult"]]:
+        """Rank the corpus against each query, without consulting the result cache."""
+        if namespace:
+            # Resolve namespace abbreviation to full URI
+            resolved_namespace = ABBREV_TO_NAMESPACE.get(namespace)
+            if resolved_namespace is None:
+                raise ValueError(f"Namespace not known: {namespace}")
+            embeddings, filtered_indices = self.filter_embeddings_ns(resolved_namespace)
+        else:
+            embeddings = self.embeddings
+            filtered_indices = None
+
+        query_embeddings = self._encode_queries(queries)
+        # Stored and query embeddings are both normalized, so dot product == cosine.
+        # One BLAS matrix product gives a row of scores per query.
+        similarities = query_embeddings @ embeddings.T
+        # The dot product of unit vectors is already the cosine similarity
+        topk_indices, topk_scores = top_k(similarities, n_results)
+        if filtered_indices is not None:
+            # Map positions in the namespace subset back to corpus rows
+            topk_indices = filtered_indices[topk_indices]
+        metadatas = self.metadatas
+        namespace_abbrevs = self.namespace_abbrevs
+        return [
+            [
+                URIResult(
+                    **metadatas[i],
+                    namespace_abbrev=namespace_abbrevs[metadatas[i]['namespace']],
+                    similarity_score=score
+                )
+                for i, score in zip(indices, scores)
+            ]
+            for indices, scores in zip(topk_indices.tolist(), topk_scores.tolist())
+        ]
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit/miss counts and current size of the search result cache."""
+        return {
+            'hits': self._result_cache_hits,
+            'misses': self._result_cache_misses,
+            'entries': len(self._result_cache)
+        }
 
 
 # Example usage
@@ -360,17 +884,31 @@ def create_encoder_from_env() -> URIEncoder:
     config = URIEncoderConfig(
         ttl_directories=ttl_directories,
         data_dir=DATA_FILES,
-        embedding_model=os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+        embedding_model=os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL),
+        embedding_backend=os.getenv("EMBEDDING_BACKEND", DEFAULT_EMBEDDING_BACKEND),
+        embedding_model_file=os.getenv("EMBEDDING_MODEL_FILE"),
+        embedding_device=os.getenv("EMBEDDING_DEVICE"),
+        encode_batch_size=int(os.getenv("ENCODE_BATCH_SIZE", ENCODE_BATCH_SIZE)),
+        parse_workers=int(os.getenv("PARSE_WORKERS")) if os.getenv("PARSE_WORKERS") else None
     )
     
     return URIEncoder(config)
 
 
-def create_finder_from_env() -> URIFinder:
-    """Create URIFinder using environment variables for configuration."""
+def create_finder_from_env(data_dir: Path = DATA_FILES, query_cache_path: Optional[Path] = None) -> URIFinder:
+    """
+    Create URIFinder using environment variables for configuration.
+    
+    QUERY_CACHE_PATH overrides query_cache_path; set it empty to disable the query cache file.
+    """
+    query_cache_path = os.getenv("QUERY_CACHE_PATH", query_cache_path)
     config = URIFinderConfig(
-        data_dir=DATA_FILES,
-        embedding_model=os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+        data_dir=data_dir,
+        embedding_model=os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL),
+        embedding_backend=os.getenv("EMBEDDING_BACKEND", DEFAULT_EMBEDDING_BACKEND),
+        embedding_model_file=os.getenv("EMBEDDING_MODEL_FILE"),
+        query_cache_size=int(os.getenv("QUERY_CACHE_SIZE", QUERY_CACHE_SIZE)),
+        query_cache_path=Path(query_cache_path).expanduser() if query_cache_path else None
     )
     
     return URIFinder(config)
@@ -0,0 +1,384 @@
+import json
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+from rdflib import RDFS
+
+from find_my_uri.cli import SearchArgumentParser, _search_and_display
+from find_my_uri.core import (
+    URIEncoder,
+    URIEncoderConfig,
+    URIFinder,
+    URIFinderConfig,
+    _split_uri,
+    create_finder_from_env,
+    replace_files,
+    save_embeddings,
+)
+
+DATA_DIR = Path(__file__).parent / "data"
+
+S223 = "http://data.ashrae.org/standard223#"
+WATR = "urn:nawi-water-ontology#"
+UNIT = "http://qudt.org/vocab/unit/"
+
+
+# --- SearchArgumentParser ---
+
+@pytest.fixture
+def search_parser():
+    return SearchArgumentParser()
+
+
+def test_parse_plain_query(search_parser):
+    args = search_parser.parse("water pump")
+    assert args.query == ["water", "pump"]
+    assert args.num_results == 3
+    assert args.namespace is None
+    assert not args.help
+
+
+def test_parse_num_results(search_parser):
+    args = search_parser.parse("-n 10 pump")
+    assert args.query == ["pump"]
+    assert args.num_results == 10
+
+
+def test_parse_namespace(search_parser):
+    args = search_parser.parse("pump -ns S223")
+    assert args.query == ["pump"]
+    assert args.namespace == "S223"
+
+
+def test_parse_options_between_query_words(search_parser):
+    args = search_parser.parse("pump -n 5 heat")
+    assert args.query == ["pump", "heat"]
+    assert args.num_results == 5
+
+
+def test_parse_quoted_query(search_parser):
+    args = search_parser.parse('"heat-exchanger coil" -ns S223')
+    assert args.query == ["heat-exchanger coil"]
+    assert args.namespace == "S223"
+
+
+def test_parse_invalid_arguments(search_parser):
+    with pytest.raises(ValueError):
+        search_parser.parse("pump -n many")
+
+
+# --- URIFinder ---
+
+# One unit vector per stored URI; queries are answered with the same vectors
+STUB_VECTORS = {
+    "pump": [1.0, 0.0, 0.0],
+    "valve": [0.8, 0.6, 0.0],
+    "clarifier": [0.0, 1.0, 0.0],
+    "celsius": [0.0, 0.0, 1.0],
+}
+
+
+class StubModel:
+    """Stands in for a SentenceTransformer, mapping known queries to fixed vectors."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, sentences, **kwargs):
+        self.calls.append(list(sentences))
+        return np.array([STUB_VECTORS[s] for s in sentences], dtype=np.float32)
+
+
+@pytest.fixture
+def finder(tmp_path):
+    metadatas = [
+        {"uri": S223 + "Pump", "label": "Pump", "local_name": "Pump", "comment": "",
+         "namespace": S223, "parents": "Equipment"},
+        {"uri": S223 + "Valve", "label": "Valve", "local_name": "Valve", "comment": "",
+         "namespace": S223, "parents": "Equipment"},
+        {"uri": WATR + "Clarifier", "label": "Clarifier", "local_name": "Clarifier", "comment": "",
+         "namespace": WATR, "parents": "Equipment"},
+        {"uri": UNIT + "DEG_C", "label": "degree Celsius", "local_name": "DEG_C", "comment": "",
+         "namespace": UNIT, "parents": ""},
+    ]
+    embeddings = np.array([STUB_VECTORS[q] for q in ("pump", "valve", "clarifier", "celsius")])
+    (tmp_path / "document_metadata.json").write_text(json.dumps(metadatas))
+    save_embeddings(embeddings, tmp_path / "embeddings.npy")
+
+    finder = URIFinder(URIFinderConfig(data_dir=tmp_path))
+    finder._embedding_model = StubModel()
+    return finder
+
+
+def test_find_similar_uris(finder):
+    results = finder.find_similar_uris("pump", n_results=2)
+    assert [r.local_name for r in results] == ["Pump", "Valve"]
+    assert results[0].namespace_abbrev == "S223"
+    assert results[0].similarity_score == pytest.approx(1.0)
+    assert results[1].similarity_score == pytest.approx(0.8)
+
+
+def test_find_similar_uris_namespace(finder):
+    results = finder.find_similar_uris("clarifier", namespace="S223", n_results=1)
+    assert [r.local_name for r in results] == ["Valve"]
+    assert all(r.namespace == S223 for r in results)
+
+
+def test_find_similar_uris_more_results_than_namespace(finder):
+    results = finder.find_similar_uris("pump", namespace="S223", n_results=10)
+    assert [r.local_name for r in results] == ["Pump", "Valve"]
+
+    results = finder.find_similar_uris("pump", namespace="WATR", n_results=10)
+    assert [r.local_name for r in results] == ["Clarifier"]
+
+
+def test_find_similar_uris_unknown_namespace(finder, capsys):
+    assert finder.find_similar_uris("pump", namespace="NOPE") == []
+    assert "Namespace not known: NOPE" in capsys.readouterr().out
+
+
+def test_repeated_query_skips_model(finder):
+    first = finder.find_similar_uris("pump", n_results=2)
+    second = finder.find_similar_uris("pump", namespace="S223", n_results=2)
+    assert first == second
+    assert finder.embedding_model.calls == [["pump"]]
+
+
+def test_negative_query_cache_size_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="query_cache_size"):
+        URIFinderConfig(data_dir=tmp_path, query_cache_size=-1)
+
+
+def test_create_finder_from_env(finder, tmp_path, monkeypatch):
+    monkeypatch.setenv("QUERY_CACHE_SIZE", "7")
+    monkeypatch.delenv("QUERY_CACHE_PATH", raising=False)
+    env_finder = create_finder_from_env(data_dir=tmp_path, query_cache_path=tmp_path / "cache.sqlite")
+    assert env_finder.config.query_cache_size == 7
+    assert env_finder.config.query_cache_path == tmp_path / "cache.sqlite"
+    assert env_finder._disk_cache is not None
+
+    monkeypatch.setenv("QUERY_CACHE_PATH", "")
+    env_finder = create_finder_from_env(data_dir=tmp_path, query_cache_path=tmp_path / "cache.sqlite")
+    assert env_finder._disk_cache is None
+
+
+def test_concurrent_searches(finder):
+    finder.config.query_cache_size = 2
+    queries = ["pump", "valve", "clarifier", "celsius"] * 50
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda q: finder.find_similar_uris(q, n_results=1), queries))
+    assert [r[0].similarity_score for r in results] == pytest.approx([1.0] * len(queries))
+    stats = finder.cache_stats()
+    assert stats["hits"] + stats["misses"] == len(queries)
+    assert stats["entries"] == 2
+
+
+def test_search_error_follows_its_header(finder, capsys):
+    _search_and_display(finder, ["pump"], "NOPE", 3)
+    out = capsys.readouterr().out
+    assert out.index("Searching for: 'pump'") < out.index("Namespace not known: NOPE")
+
+
+def test_search_headers_precede_results(finder, capsys):
+    _search_and_display(finder, ["pump", "celsius"], None, 1)
+    out = capsys.readouterr().out
+    assert (out.index("Searching for: 'pump'") < out.index("Pump")
+            < out.index("Searching for: 'celsius'") < out.index("DEG_C"))
+
+
+# --- URIEncoder.store_vectors ---
+
+class StubEncoderModel:
+    """Stands in for a SentenceTransformer, with a fixed pseudo-random unit vector per text."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+    @staticmethod
+    def vector(text):
+        vector = np.random.default_rng(zlib.crc32(text.encode())).standard_normal(8)
+        return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+    def encode(self, sentences, **kwargs):
+        self.encoded.extend(sentences)
+        return np.stack([self.vector(s) for s in sentences])
+
+
+def class_item(namespace, local_name, comment=""):
+    return {"uri": namespace + local_name, "label": local_name, "local_name": local_name,
+            "comment": comment, "namespace": namespace, "parents": ""}
+
+
+@pytest.fixture
+def store_encoder(tmp_path, monkeypatch):
+    # Namespaces interleaved, a repeated row for one URI, and two URIs with the same document
+    items = [
+        class_item(S223, "Pump", "Moves fluid."),
+        class_item(UNIT, "DEG_C"),
+        class_item(S223, "Valve"),
+        class_item(UNIT, "DEG_C"),
+        class_item(WATR, "Pump", "Moves fluid."),
+        class_item(S223, "Fan"),
+    ]
+    encoder = URIEncoder(URIEncoderConfig(ttl_directories=[], data_dir=tmp_path))
+    monkeypatch.setattr(encoder, "extract_classes_with_sparql", lambda: items)
+    encoder._embedding_model = StubEncoderModel()
+    return encoder
+
+
+def test_store_vectors_rows_match_documents(store_encoder):
+    store_encoder.store_vectors()
+    assert [m["uri"] for m in store_encoder.metadatas] == [
+        S223 + "Pump", S223 + "Valve", S223 + "Fan", UNIT + "DEG_C", WATR + "Pump"
+    ]
+    for row, document in enumerate(store_encoder.documents):
+        np.testing.assert_array_equal(store_encoder.embeddings[row], StubEncoderModel.vector(document))
+
+
+def test_store_vectors_encodes_duplicates_once(store_encoder):
+    store_encoder.store_vectors()
+    encoded = store_encoder.embedding_model.encoded
+    assert sorted(encoded) == sorted(set(store_encoder.documents))
+    assert len(encoded) == 4
+
+
+def test_store_vectors_again_reuses_rows(store_encoder, tmp_path):
+    store_encoder.store_vectors()
+    first = np.load(tmp_path / "embeddings.npy")
+    store_encoder.embedding_model.encoded.clear()
+
+    store_encoder.store_vectors()
+    assert store_encoder.embedding_model.encoded == []
+    np.testing.assert_array_equal(np.load(tmp_path / "embeddings.npy"), first)
+
+
+def test_stored_namespaces_are_contiguous(store_encoder, tmp_path):
+    store_encoder.store_vectors()
+    finder = URIFinder(URIFinderConfig(data_dir=tmp_path))
+    assert finder.namespace_embeddings.keys() == finder.namespace_indices.keys() == {S223, UNIT, WATR}
+    for namespace, indices in finder.namespace_indices.items():
+        np.testing.assert_array_equal(finder.namespace_embeddings[namespace], finder.embeddings[indices])
+
+
+def test_mismatched_store_is_rejected(store_encoder, tmp_path):
+    store_encoder.store_vectors()
+    save_embeddings(store_encoder.embeddings[:-1], tmp_path / "embeddings.npy")
+    with pytest.raises(ValueError, match="describes 5 URIs but .* holds 4 embeddings"):
+        URIFinder(URIFinderConfig(data_dir=tmp_path))
+
+
+def test_replace_files_keeps_old_files_on_failure(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.write_bytes(b"old first")
+    second.write_bytes(b"old second")
+
+    def fail(f):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        replace_files({first: lambda f: f.write(b"new first"), second: fail})
+    assert first.read_bytes() == b"old first"
+    assert second.read_bytes() == b"old second"
+
+    replace_files({first: lambda f: f.write(b"new first"), second: lambda f: f.write(b"new second")})
+    assert first.read_bytes() == b"new first"
+    assert second.read_bytes() == b"new second"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["first", "second"]
+
+
+# --- TTL loading ---
+
+def test_parallel_load_matches_serial(tmp_path):
+    ttl_dir = tmp_path / "ttl"
+    (ttl_dir / "sub").mkdir(parents=True)
+    for i in range(5):
+        (ttl_dir / "sub" / f"class{i}.ttl").write_text(
+            "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .\n"
+            "@prefix s223: <http://data.ashrae.org/standard223#> .\n"
+            f"s223:Class{i} a s223:Class ; rdfs:label \"Class {i}\" ; rdfs:subClassOf s223:Concept .\n"
+        )
+    (ttl_dir / "broken.ttl").write_text("this is not turtle .")
+
+    graphs = []
+    for parse_workers in (None, 1):
+        encoder = URIEncoder(URIEncoderConfig(
+            ttl_directories=[ttl_dir], data_dir=tmp_path / f"data{parse_workers}", parse_workers=parse_workers
+        ))
+        assert encoder.load_ttl_files() == 5
+        graphs.append(set(encoder.graph))
+    assert len(graphs[0]) == 15
+    assert graphs[0] == graphs[1]
+
+
+# --- Class extraction ---
+
+EXTRACTION_QUERY = """
+SELECT DISTINCT ?klass ?label ?comment
+WHERE {
+    { ?klass a s223:Class ; rdfs:label ?label }
+    UNION
+    { ?klass a watr:Class ; rdfs:label ?label }
+    UNION
+    { ?klass a qudt:Unit ; rdfs:label ?label FILTER (lang(?label) = "en") }
+    UNION
+    { ?klass a qudt:QuantityKind ; rdfs:label ?label FILTER (lang(?label) = "en") }
+    OPTIONAL { ?klass rdfs:comment ?comment }
+}
+ORDER BY ?klass
+"""
+
+
+@pytest.fixture
+def encoder(tmp_path):
+    encoder = URIEncoder(URIEncoderConfig(ttl_directories=[DATA_DIR], data_dir=tmp_path))
+    encoder.load_ttl_files()
+    return encoder
+
+
+def sparql_classes(graph):
+    """Reference extraction through the SPARQL evaluator and the subClassOf+ path."""
+    classes = []
+    for row in graph.query(EXTRACTION_QUERY):
+        namespace, local_name = _split_uri(str(row.klass))
+        parents = [_split_uri(str(uri))[1] for uri in graph.objects(row.klass, RDFS.subClassOf * '+')][:-2]
+        classes.append({
+            "uri": str(row.klass),
+            "label": str(row.label),
+            "local_name": local_name,
+            "comment": str(row.comment) if row.comment else "",
+            "namespace": namespace,
+            "parents": ", ".join(parents),
+        })
+    return classes
+
+
+def test_extraction_matches_sparql(encoder):
+    classes = encoder.extract_classes_with_sparql()
+    expected = sparql_classes(encoder.graph)
+    assert [c["uri"] for c in classes] == [c["uri"] for c in expected]
+    assert sorted(classes, key=json.dumps) == sorted(expected, key=json.dumps)
+
+
+def test_extraction_rows(encoder):
+    classes = {(c["uri"], c["label"]): c for c in encoder.extract_classes_with_sparql()}
+    assert sorted(classes) == [
+        (S223 + "Concept", "Concept"),
+        (S223 + "Connectable", "Connectable"),
+        (S223 + "Equipment", "Equipment"),
+        (S223 + "Pump", "Pompe"),
+        (S223 + "Pump", "Pump"),
+        (UNIT + "DEG_C", "degree Celsius"),
+        (WATR + "Clarifier", "Clarifier"),
+    ]
+    pump = classes[(S223 + "Pump", "Pump")]
+    assert pump["comment"] == "A machine that moves fluid."
+    assert pump["parents"] == "Equipment, Connectable"
+    assert pump["namespace"] == S223
+    assert classes[(WATR + "Clarifier", "Clarifier")]["parents"] == "Equipment, Connectable"
+    assert classes[(UNIT + "DEG_C", "degree Celsius")]["namespace"] == UNIT